@@ -0,0 +1,20 @@
+def encode_strings(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+
+    if isinstance(value, list):
+        return [encode_strings(item) for item in value]
+
+    return value
+
+
+def str_object_hook(pairs):
+    """
+    json gives back unicode while the names and fields parsed from source
+    are str, which would show up as u'' in reports and never compare equal
+    as dict keys built from either.
+    """
+    return dict(
+        (encode_strings(key), encode_strings(value))
+        for key, value in pairs.items()
+    )
@@ -15,7 +15,6 @@ DRF_FIELD_PARAMS = (
     'allow_null',
     'source',
     'default',
-    'source',
 )
 
 
@@ -23,3 +22,38 @@ HEADERS = (
     'field_name',
     'func_name',
 ) + DRF_FIELD_PARAMS
+
+
+# Where to look for serializer and view classes, relative to the project root.
+# `*` also matches across directories so `apiv2/serializers/*.py` includes
+# nested packages.
+SERIALIZER_GLOBS = (
+    'apiv2/serializers/*.py',
+    'apiv2/fields.py',
+)
+
+VIEW_GLOBS = (
+    'apiv2/views/*.py',
+)
+
+
+# A class is picked up if one of its bases matches this (or is itself a class
+# that was picked up).
+SERIALIZER_BASE_PATTERN = r'(Serializer|Field|Mixin)$'
+
+VIEW_BASE_PATTERN = r'(View|ViewSet|Mixin)$'
+
+
+# Kept in the git directory so that it doesn't show up in `git status`.
+MANIFEST_FILENAME = 'docdiffer_manifest.json'
+
+# How many revisions of each root the manifest remembers.
+MANIFEST_REVISIONS = 10
+
+
+# Bounded memory mode: default ceiling for resolved fields kept in memory.
+MAX_MEMORY_MB = 256
+
+
+# How many sources may wait to be parsed (and be parsed at once) with --jobs.
+QUEUE_SIZE = 64
@@ -1,37 +1,132 @@
 import argparse
 import os
+import sys
 
 from pprint import pformat
 from termcolor import colored, cprint
 
-from git import git_checkout, get_changed_files
-from parser import FieldFinder
+from git import (GitRepo, git_checkout, get_changed_files, get_current_branch,
+                 is_git_repo)
+from impact import ImpactReport
+from inventory import Inventory
+from layout import Layout
+from manifest import Manifest
+from parser import BoundedFieldFinder, FieldFinder
+from pipeline import Pipeline
+from snapshot import Snapshot
 
 import consts
 
 
-def main(branch, root):
-    serializer_directory = os.path.join(root, 'apiv2/serializers')
-    view_directory = os.path.join(root, 'apiv2/views')
-    files = [os.path.join(root, 'apiv2/fields.py')]
+def discover(layout, manifest, max_memory=None, pipeline=None):
+    if max_memory is None:
+        return FieldFinder.discover(layout, manifest=manifest,
+                                    pipeline=pipeline)
 
-    changed_files = get_changed_files(branch)
+    ff = BoundedFieldFinder.discover(layout, manifest=manifest,
+                                     pipeline=pipeline,
+                                     max_bytes=max_memory * 1024 * 1024)
+    ff.resolve_all()
 
-    current_ff = FieldFinder.crawl(
-        serializer_directory, view_directory, files=files
-    )
+    return ff
 
-    with git_checkout(branch) as current_branch:
-        previous_ff = FieldFinder.crawl(
-            serializer_directory, view_directory, files=files
-        )
 
+def main(branch, layout, manifest, repo, max_memory=None, jobs=None):
+    changed_files = get_changed_files(branch, layout, repo=repo)
+
+    # both revisions are kept around so each gets half of the ceiling
+    if max_memory is not None:
+        max_memory = max_memory / 2.0
+
+    if jobs:
+        # the previous revision is read straight out of git, no checkout
+        current_branch = get_current_branch()
+        current_ff = discover(layout, manifest, max_memory,
+                              pipeline=Pipeline.for_worktree(manifest,
+                                                             jobs=jobs))
+        previous_ff = discover(layout, manifest, max_memory,
+                               pipeline=Pipeline.for_revision(repo, branch,
+                                                              jobs=jobs))
+    else:
+        current_ff = discover(layout, manifest, max_memory)
+
+        with git_checkout(branch) as current_branch:
+            previous_ff = discover(layout, manifest, max_memory)
+
+    manifest.save()
+
+    registry = current_ff.serializer_registry
+    changed_serializers = [
+        serializer_name
+        for filename in changed_files
+        for serializer_name in registry.get_classes_in_file(filename)
+    ]
+
+    try:
+        print_report(branch, current_branch, current_ff, previous_ff,
+                     changed_serializers)
+    finally:
+        current_ff.close()
+        previous_ff.close()
+
+
+def snapshot(layout, manifest, output, max_memory=None, jobs=None):
+    pipeline = Pipeline.for_worktree(manifest, jobs=jobs) if jobs else None
+    ff = discover(layout, manifest, max_memory, pipeline=pipeline)
+    manifest.save()
+
+    try:
+        Snapshot.write(ff, output)
+    finally:
+        ff.close()
+
+
+def inventory(layout, manifest, repo, output=None, fmt='csv', ref=None,
+              max_memory=None, jobs=None):
+    if ref:
+        pipeline = Pipeline.for_revision(repo, ref, jobs=jobs)
+    else:
+        pipeline = Pipeline.for_worktree(manifest, jobs=jobs) if jobs else None
+
+    ff = discover(layout, manifest, max_memory, pipeline=pipeline)
+    manifest.save()
+
+    try:
+        table = Inventory.from_finder(ff)
+    finally:
+        ff.close()
+
+    f = open(output, 'wb') if output else sys.stdout
+    try:
+        if fmt == 'csv':
+            table.write_csv(f)
+        else:
+            f.write(table.tabulate(tablefmt=fmt) + '\n')
+    finally:
+        if output:
+            f.close()
+
+
+def diff_snapshots(previous_path, current_path):
+    previous = Snapshot(previous_path)
+    current = Snapshot(current_path)
+
+    try:
+        print_report(previous_path, current_path, current, previous,
+                     current.changed_serializers(previous))
+    finally:
+        current.close()
+        previous.close()
+
+
+def print_report(previous_label, current_label, current_ff, previous_ff,
+                 changed_serializers):
     affected_serializers = current_ff.difference(previous_ff)
 
     if affected_serializers:
         print('From {} -> {}\n'.format(
-            colored(branch, consts.Colours.INFO, attrs=['bold']),
-            colored(current_branch, consts.Colours.INFO, attrs=['bold'])
+            colored(previous_label, consts.Colours.INFO, attrs=['bold']),
+            colored(current_label, consts.Colours.INFO, attrs=['bold'])
         ))
 
         if affected_serializers.added:
@@ -53,33 +148,126 @@ def main(branch, root):
                           for serializer_name in affected_serializers.removed]
             cprint(removed_pp, consts.Colours.REMOVED)
 
-    registry = current_ff.serializer_registry
-    for filename in changed_files:
-        for serializer_name in registry.get_classes_in_file(filename):
-            # this case handled above
-            if serializer_name in affected_serializers.added:
-                continue
+    # added serializers are handled above
+    impact = ImpactReport.from_serializers(current_ff, previous_ff,
+                                           changed_serializers)
 
-            current_fields = current_ff.find_serializer_fields(serializer_name)
-            previous_fields = previous_ff.find_serializer_fields(serializer_name)
+    for serializer_name, diff in impact.diffs.items():
+        name_desc = colored(serializer_name,
+                            consts.Colours.ADDED,
+                            attrs=['underline', 'bold'])
+        print(name_desc)
+        print(diff)
 
-            diff = current_fields.stringify_diff(previous_fields)
+        subclasses = impact.subclasses[serializer_name]
+        if subclasses:
+            cprint('Inherited by: ' + ', '.join(subclasses),
+                   consts.Colours.WARNING)
 
-            if diff:
-                name_desc = colored(serializer_name,
-                                    consts.Colours.ADDED,
-                                    attrs=['underline', 'bold'])
-                print(name_desc)
-                print(diff)
+        endpoints = impact.endpoints[serializer_name]
+        if endpoints:
+            cprint('Impacted endpoints:', consts.Colours.WARNING)
+            for view_name, via in endpoints:
+                if via != serializer_name:
+                    view_name = '{} (via {})'.format(view_name, via)
+                cprint('  ' + view_name, consts.Colours.WARNING)
+
+        if subclasses or endpoints:
+            print('')
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
 
+    parser.add_argument('command', nargs='?', default='branch',
+                        choices=('branch', 'snapshot', 'diff', 'inventory'),
+                        help='branch: diff the working tree against --branch '
+                             '(default), snapshot: write the working tree\'s '
+                             'API to --output, diff: diff two snapshots, '
+                             'inventory: list every field of --ref (or the '
+                             'working tree)')
+    parser.add_argument('snapshots', nargs='*',
+                        help='Previous and current snapshot files for diff')
+    parser.add_argument('--output',
+                        help='Snapshot or inventory file to write')
+    parser.add_argument('--format', default='csv', dest='fmt',
+                        help='Inventory format: csv or a tabulate table '
+                             'format such as grid')
+    parser.add_argument('--ref', help='Revision to take the inventory of')
     parser.add_argument('--branch', help='Previous branch name',
                         default='master')
     parser.add_argument('--root', help='Project root (sigma)')
+    parser.add_argument('--serializer-glob', action='append',
+                        dest='serializer_globs',
+                        help='Glob relative to root of files with serializers')
+    parser.add_argument('--view-glob', action='append', dest='view_globs',
+                        help='Glob relative to root of files with views')
+    parser.add_argument('--serializer-base',
+                        default=consts.SERIALIZER_BASE_PATTERN,
+                        help='Regex of base class names of serializers')
+    parser.add_argument('--view-base', default=consts.VIEW_BASE_PATTERN,
+                        help='Regex of base class names of views')
+    parser.add_argument('--manifest',
+                        help='Where to keep the discovered file manifest')
+    parser.add_argument('--max-memory', type=int,
+                        help='Resolve base-first keeping at most this many MB '
+                             'of resolved fields in memory, spilling the '
+                             'rest to disk. Parsed classes are not counted')
+    parser.add_argument('--jobs', type=int,
+                        help='Read and parse files concurrently with this '
+                             'many parse processes')
 
     args = parser.parse_args()
 
-    main(args.branch, args.root)
+    if args.command == 'diff':
+        if len(args.snapshots) != 2:
+            parser.error('diff needs exactly two snapshot files')
+
+        diff_snapshots(*args.snapshots)
+        parser.exit()
+
+    if args.command == 'snapshot' and not args.output:
+        parser.error('snapshot needs --output')
+
+    if args.max_memory is not None and args.max_memory <= 0:
+        parser.error('--max-memory must be a positive number of MB')
+
+    layout = Layout(
+        args.root,
+        serializer_globs=tuple(args.serializer_globs or consts.SERIALIZER_GLOBS),
+        view_globs=tuple(args.view_globs or consts.VIEW_GLOBS),
+        serializer_base_pattern=args.serializer_base,
+        view_base_pattern=args.view_base
+    )
+    repo = None
+    manifest = Manifest()
+
+    # snapshots and inventories of the working tree just walk the roots, so
+    # that they also work on build trees that aren't git checkouts
+    if args.command == 'branch' or args.ref:
+        if not is_git_repo(args.root):
+            parser.error('{} needs {} to be in a git repository'.format(
+                '--ref' if args.ref else 'branch', args.root
+            ))
+
+        repo = GitRepo(args.root)
+        manifest = Manifest.load(
+            repo,
+            args.manifest or os.path.join(repo.git_dir,
+                                          consts.MANIFEST_FILENAME)
+        )
+
+    try:
+        if args.command == 'inventory':
+            inventory(layout, manifest, repo, output=args.output,
+                      fmt=args.fmt, ref=args.ref, max_memory=args.max_memory,
+                      jobs=args.jobs)
+        elif args.command == 'snapshot':
+            snapshot(layout, manifest, args.output,
+                     max_memory=args.max_memory, jobs=args.jobs)
+        else:
+            main(args.branch, layout, manifest, repo,
+                 max_memory=args.max_memory, jobs=args.jobs)
+    finally:
+        if repo:
+            repo.close()
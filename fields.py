@@ -133,6 +133,16 @@ class Fields(dict):
 
         return output
 
+    def changed_field_names(self, base):
+        current = self.as_dict()
+        previous = base.as_dict()
+
+        return set(
+            key
+            for key in set(current.keys()).union(previous.keys())
+            if current.get(key) != previous.get(key)
+        )
+
     def as_dict(self):
         def describe_field_type(field):
             field_type = field.get('func_name', '')
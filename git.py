@@ -1,3 +1,5 @@
+import binascii
+import os
 import re
 
 from contextlib import contextmanager
@@ -5,6 +7,8 @@ from subprocess import Popen, PIPE
 
 import consts
 
+from layout import Layout
+
 
 def checked_command(args, ignore_if=''):
     # TODO: ghetto function..
@@ -36,7 +40,14 @@ def get_my_ip():
     return p.stdout.read().strip()
 
 
-def get_changed_files(branch='master'):
+def is_git_repo(path):
+    process = Popen(['git', 'rev-parse', '--git-dir'],
+                    stdout=PIPE, stderr=PIPE, cwd=path)
+    process.communicate()
+    return process.returncode == 0
+
+
+def get_changed_files(branch='master', layout=None, repo=None):
     # TODO: this is ghetto...
     if get_my_ip() != consts.OFFICE_IP:
         raise Exception('Not on VPN')
@@ -44,8 +55,273 @@ def get_changed_files(branch='master'):
     with git_checkout(branch):
         checked_command(["git", "pull"], ignore_if='From')
 
-    process = checked_command(["git", "diff", "--name-only", branch, "apiv2/serializers"])
+    layout = layout or Layout('.')
+    repo = repo or GitRepo(layout.root)
+    return repo.changed_files(branch, None, layout)
+
+
+class MissingObject(Exception):
+    pass
+
+
+class GitRepo(object):
+    """
+    Talks to a repository through one long-lived `git cat-file --batch`
+    process, diffing trees itself so that subtrees with the same hash on both
+    sides are skipped without being listed.
+
+    GitRepo.refs
+    - which tree does this ref point to?
+    - ref:str -> tree sha: str
+
+    GitRepo.trees
+    - what is in this tree?
+    - tree sha:str -> {name: (mode, sha)}
+
+    GitRepo.diffs
+    - which paths differ between these trees under these roots?
+    - (tree sha, tree sha, roots) -> paths: [str]
+    """
+
+    TREE_MODE = '40000'
+
+    def __init__(self, cwd=None):
+        self.cwd = cwd
+        self.process = Popen(['git', 'cat-file', '--batch'],
+                             stdin=PIPE, stdout=PIPE, cwd=cwd)
+        self.refs = {}
+        self.trees = {}
+        self.diffs = {}
+        self._prefix = None
+
+    @property
+    def prefix(self):
+        """Path of cwd relative to the top of the repository."""
+        if self._prefix is None:
+            process = Popen(['git', 'rev-parse', '--show-prefix'],
+                            stdout=PIPE, cwd=self.cwd)
+            self._prefix = process.communicate()[0].strip()
+
+        return self._prefix
+
+    @property
+    def git_dir(self):
+        process = Popen(['git', 'rev-parse', '--git-dir'],
+                        stdout=PIPE, cwd=self.cwd)
+        return os.path.join(self.cwd or '.', process.communicate()[0].strip())
+
+    def read_object(self, name):
+        self.process.stdin.write(name + '\n')
+        self.process.stdin.flush()
+
+        header = self.process.stdout.readline().split()
+        if header[-1] == 'missing':
+            raise MissingObject('No such git object {}'.format(name))
+
+        sha, kind, size = header
+        data = self.process.stdout.read(int(size))
+        # every object is followed by a newline
+        self.process.stdout.read(1)
+
+        return sha, kind, data
+
+    def resolve_tree(self, ref):
+        if ref not in self.refs:
+            sha, _, data = self.read_object(ref + '^{tree}')
+            self.trees.setdefault(sha, self.parse_tree(data))
+            self.refs[ref] = sha
+
+        return self.refs[ref]
+
+    @classmethod
+    def parse_tree(cls, data):
+        # entries are `<mode> <name>\0<20 byte sha>`
+        entries = {}
+        i = 0
+
+        while i < len(data):
+            space = data.index(' ', i)
+            nul = data.index('\0', space)
+            entries[data[space + 1:nul]] = (
+                data[i:space], binascii.hexlify(data[nul + 1:nul + 21])
+            )
+            i = nul + 21
+
+        return entries
+
+    def read_tree(self, sha):
+        if sha is None:
+            return {}
+
+        if sha not in self.trees:
+            _, _, data = self.read_object(sha)
+            self.trees[sha] = self.parse_tree(data)
+
+        return self.trees[sha]
+
+    def lookup(self, tree, path):
+        """(mode, sha) of path inside tree, or (None, None) if missing."""
+        entry = (self.TREE_MODE, tree)
+
+        for name in filter(None, path.split('/')):
+            if entry[0] != self.TREE_MODE:
+                return None, None
+
+            entry = self.read_tree(entry[1]).get(name, (None, None))
+
+        return entry
+
+    def diff_entries(self, previous, current, path):
+        previous_mode, previous_sha = previous
+        current_mode, current_sha = current
+
+        if previous == current:
+            return []
+
+        previous_is_tree = previous_mode == self.TREE_MODE
+        current_is_tree = current_mode == self.TREE_MODE
+
+        if not (previous_is_tree or current_is_tree):
+            return [path]
+
+        changed = []
+        if previous_mode and not previous_is_tree or \
+                current_mode and not current_is_tree:
+            # a file was replaced by a directory or the other way round
+            changed.append(path)
+
+        previous_tree = self.read_tree(previous_sha if previous_is_tree else None)
+        current_tree = self.read_tree(current_sha if current_is_tree else None)
+
+        for name in sorted(set(previous_tree).union(current_tree)):
+            changed.extend(self.diff_entries(
+                previous_tree.get(name, (None, None)),
+                current_tree.get(name, (None, None)),
+                '/'.join(filter(None, [path, name]))
+            ))
+
+        return changed
+
+    def changed_paths(self, previous_ref, current_ref, roots):
+        """Paths relative to the top of the repository under roots."""
+        previous_tree = self.resolve_tree(previous_ref)
+        current_tree = self.resolve_tree(current_ref)
+        key = (previous_tree, current_tree, tuple(roots))
+
+        if key not in self.diffs:
+            self.diffs[key] = [
+                path
+                for root in roots
+                for path in self.diff_entries(
+                    self.lookup(previous_tree, root),
+                    self.lookup(current_tree, root),
+                    root.rstrip('/')
+                )
+            ]
+
+        return self.diffs[key]
+
+    def changed_files(self, previous_ref, current_ref, layout):
+        """
+        Changed files under the layout's roots, as found by Layout. A
+        current_ref of None means the working tree, which adds uncommitted
+        changes to the tree diff against HEAD.
+        """
+        prefix = self.prefix
+        roots = [prefix + root for root in layout.roots]
+        paths = self.changed_paths(previous_ref, current_ref or 'HEAD', roots)
+
+        if current_ref is None:
+            seen = set(paths)
+            paths = paths + [
+                path
+                for _, path in self.status(roots)
+                if not (path in seen or seen.add(path))
+            ]
+
+        return [
+            os.path.join(layout.root, path[len(prefix):])
+            for path in paths
+        ]
+
+    def repo_path(self, path):
+        """Path relative to the top of the repository of path under cwd."""
+        relative = os.path.relpath(path, self.cwd or '.')
+        return self.prefix + ('' if relative == '.' else relative)
+
+    def tree_sha(self, path, ref='HEAD'):
+        """
+        Hash of what is at path (under cwd) in ref, or None. Not memoized
+        since the ref may move, e.g. when a branch is checked out.
+        """
+        try:
+            return self.read_object('{}:{}'.format(ref, self.repo_path(path)))[0]
+        except MissingObject:
+            return None
+
+    def status(self, paths):
+        """
+        (status code, path) of uncommitted changes in the working tree,
+        including untracked files, under paths relative to the top of the
+        repository.
+        """
+        process = Popen(
+            ['git', 'status', '--porcelain', '--untracked-files=all', '--'] +
+            [':(top)' + path for path in paths],
+            stdout=PIPE, cwd=self.cwd
+        )
+
+        changes = []
+        for line in process.communicate()[0].splitlines():
+            code, path = line[:2], line[3:]
+            # renames are `old -> new`
+            for changed_path in path.split(' -> '):
+                changes.append((code, changed_path))
+
+        return changes
+
+    def adds_or_removes_files(self, path):
+        """
+        True iff the working tree has python files under path (under cwd)
+        that aren't in HEAD or is missing some that are.
+        """
+        return any(
+            not set(code) <= set(' M') and changed_path.endswith('.py')
+            for code, changed_path in self.status([self.repo_path(path)])
+        )
+
+    def list_files(self, ref, path):
+        """Python files at or under path in ref, as seen from cwd."""
+        mode, sha = self.lookup(self.resolve_tree(ref), self.repo_path(path))
+
+        if mode is None:
+            return []
+
+        if mode != self.TREE_MODE:
+            return [path]
+
+        return self.walk_tree(sha, path)
+
+    def walk_tree(self, sha, path):
+        files = []
+
+        for name, (mode, entry_sha) in sorted(self.read_tree(sha).items()):
+            entry_path = os.path.join(path, name)
+
+            if mode == self.TREE_MODE:
+                files.extend(self.walk_tree(entry_sha, entry_path))
+            elif os.path.splitext(name)[1] == '.py':
+                files.append(entry_path)
+
+        return files
 
-    return [re.sub('sigma/', './', x) for x in process.stdout.read().split()]
+    def read_file(self, ref, filename):
+        _, sha = self.lookup(self.resolve_tree(ref), self.repo_path(filename))
+        if sha is None:
+            raise Exception('{} is not in {}'.format(filename, ref))
 
+        return self.read_object(sha)[2]
 
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
@@ -0,0 +1,145 @@
+from collections import OrderedDict, defaultdict, deque
+
+
+def ancestors(graph, serializer_name):
+    """
+    All serializers serializer_name inherits from, given a graph of
+    serializer_name -> base names.
+    """
+    found = set()
+    stack = list(graph.get(serializer_name, ()))
+
+    while stack:
+        base = stack.pop()
+        if base not in found:
+            found.add(base)
+            stack.extend(graph.get(base, ()))
+
+    return found
+
+
+class ImpactReport(object):
+    """
+    Works out which serializers and views are affected by changes to
+    serializers, diffing each changed serializer once and propagating that
+    diff to its subclasses and the views that use them.
+
+    ImpactReport.diffs
+    - what changed in this serializer itself?
+    - serializer_name:str -> diff: str
+
+    ImpactReport.changed_fields
+    - which fields does this serializer's diff touch?
+    - serializer_name:str -> field names: set
+
+    ImpactReport.unchanged
+    - which serializers were diffed and came out the same?
+
+    ImpactReport.subclasses
+    - which serializers inherit this serializer's changes, i.e. don't
+      declare every changed field themselves and weren't found unchanged?
+    - serializer_name:str -> subclass names: [str]
+
+    ImpactReport.endpoints
+    - which views serve this serializer's changes, and through which class?
+    - serializer_name:str -> [(view_name: str, via serializer_name: str)]
+    """
+
+    def __init__(self, current_ff, previous_ff):
+        self.current_ff = current_ff
+        self.previous_ff = previous_ff
+        self.diffs = OrderedDict()
+        self.changed_fields = {}
+        self.unchanged = set()
+        self.subclasses = {}
+        self.endpoints = {}
+
+    @classmethod
+    def from_serializers(cls, current_ff, previous_ff, serializer_names):
+        report = cls(current_ff, previous_ff)
+        report.add_diffs(serializer_names)
+        report.propagate()
+
+        return report
+
+    def add_diffs(self, serializer_names):
+        graph = self.current_ff.dependency_graph()
+        seen = set()
+        serializer_names = [name for name in serializer_names
+                            if not (name in seen or seen.add(name))]
+
+        # bases first, so that subclasses can reuse their diff
+        for serializer_name in sorted(
+                serializer_names,
+                key=lambda name: len(ancestors(graph, name))):
+            # added serializers are reported separately
+            if not self.previous_ff.has_serializer(serializer_name):
+                continue
+
+            current_fields = self.current_ff.find_serializer_fields(
+                serializer_name
+            )
+            previous_fields = self.previous_ff.find_serializer_fields(
+                serializer_name
+            )
+            diff = current_fields.stringify_diff(previous_fields)
+
+            if not diff:
+                self.unchanged.add(serializer_name)
+                continue
+
+            # nothing changed beyond what an ancestor already reports, this
+            # serializer shows up under that ancestor's subclasses instead
+            if any(self.diffs.get(ancestor) == diff
+                   for ancestor in ancestors(graph, serializer_name)):
+                continue
+
+            self.diffs[serializer_name] = diff
+            self.changed_fields[serializer_name] = \
+                current_fields.changed_field_names(previous_fields)
+
+    def propagate(self):
+        subclass_graph = self.current_ff.subclass_graph()
+        consumers = defaultdict(list)
+
+        for view_name, serializer_name in sorted(
+                self.current_ff.view_serializers.items()):
+            # serializer_class may be referenced through its module
+            consumers[serializer_name.split('.')[-1]].append(view_name)
+
+        for serializer_name in self.diffs:
+            descendants = []
+            seen = set([serializer_name])
+            # each subclass carries the changed fields it still inherits
+            queue = deque([(serializer_name,
+                            self.changed_fields[serializer_name])])
+
+            while queue:
+                name, field_names = queue.popleft()
+
+                for subclass in sorted(subclass_graph[name]):
+                    if subclass in seen:
+                        continue
+                    seen.add(subclass)
+
+                    inherited = field_names.difference(
+                        self.current_ff.own_field_names(subclass)
+                    )
+                    if not inherited or subclass in self.unchanged:
+                        continue
+
+                    descendants.append(subclass)
+                    queue.append((subclass, inherited))
+
+            self.subclasses[serializer_name] = descendants
+            self.endpoints[serializer_name] = [
+                (view_name, via)
+                for via in [serializer_name] + descendants
+                for view_name in consumers[via]
+            ]
+
+    def __nonzero__(self):
+        return bool(self.diffs)
+
+    def __bool__(self):
+        return self.__nonzero__()
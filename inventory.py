@@ -0,0 +1,61 @@
+import csv
+
+from tabulate import tabulate
+
+import consts
+
+
+class Inventory(object):
+    """
+    Table of every field of every resolved serializer, one row per field and
+    one more per dynamic representation of it.
+
+    Inventory.columns
+    - column_name:str -> values: list, all of the same length
+    """
+
+    COLUMNS = ('serializer', 'condition') + consts.HEADERS
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_finder(cls, ff):
+        columns = dict((column, []) for column in cls.COLUMNS)
+        appenders = [(columns[column].append, column)
+                     for column in consts.HEADERS]
+        serializer_column = columns['serializer'].append
+        condition_column = columns['condition'].append
+
+        def add_row(serializer_name, condition, field):
+            serializer_column(serializer_name)
+            condition_column(condition)
+            for append, column in appenders:
+                append(field.get(column, ''))
+
+        for serializer_name in sorted(ff.serializer_registry.nodes):
+            fields = ff.find_serializer_fields(serializer_name)
+
+            for field_name in sorted(fields):
+                field = fields[field_name]
+                add_row(serializer_name, '', field)
+
+                for condition in sorted(field.representations):
+                    add_row(serializer_name, condition,
+                            field.representations[condition])
+
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns['serializer'])
+
+    def rows(self):
+        return zip(*[self.columns[column] for column in self.COLUMNS])
+
+    def write_csv(self, f):
+        writer = csv.writer(f)
+        writer.writerow(self.COLUMNS)
+        writer.writerows(self.rows())
+
+    def tabulate(self, tablefmt='grid'):
+        return tabulate(self.rows(), headers=self.COLUMNS, tablefmt=tablefmt)
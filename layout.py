@@ -0,0 +1,80 @@
+import fnmatch
+import os
+
+import consts
+
+from manifest import Manifest
+
+
+WILDCARD_CHARS = '*?['
+
+
+def glob_root(pattern):
+    """
+    The directory a glob is rooted at, i.e. everything up to the first path
+    component with a wildcard in it. A pattern without wildcards is returned
+    as-is.
+    """
+    static_parts = []
+
+    for part in pattern.split('/'):
+        if any(c in part for c in WILDCARD_CHARS):
+            break
+
+        static_parts.append(part)
+
+    return '/'.join(static_parts)
+
+
+class Layout(object):
+    """
+    Where the serializers and views of a project live and how to recognise
+    them.
+    """
+
+    def __init__(self, root,
+                 serializer_globs=consts.SERIALIZER_GLOBS,
+                 view_globs=consts.VIEW_GLOBS,
+                 serializer_base_pattern=consts.SERIALIZER_BASE_PATTERN,
+                 view_base_pattern=consts.VIEW_BASE_PATTERN):
+        self.root = root
+        self.serializer_globs = serializer_globs
+        self.view_globs = view_globs
+        self.serializer_base_pattern = serializer_base_pattern
+        self.view_base_pattern = view_base_pattern
+
+    @property
+    def roots(self):
+        """Directories (or files) relative to root that may hold API code."""
+        return sorted(set(
+            glob_root(pattern)
+            for pattern in self.serializer_globs + self.view_globs
+        ))
+
+    def find_files(self, globs, manifest=None, listing=None):
+        """
+        Files matching globs. listing gives the python files at or under a
+        path and defaults to the (on-disk) manifest.
+        """
+        listing = listing or (manifest or Manifest()).listing
+        files = []
+
+        for pattern in globs:
+            full_pattern = os.path.join(self.root, pattern)
+            files.extend(
+                filename
+                for filename
+                in listing(os.path.join(self.root, glob_root(pattern)))
+                if fnmatch.fnmatch(filename, full_pattern)
+            )
+
+        seen = set()
+        return [f for f in files if not (f in seen or seen.add(f))]
+
+    def serializer_files(self, manifest=None, listing=None):
+        return self.find_files(self.serializer_globs, manifest=manifest,
+                               listing=listing)
+
+    def view_files(self, manifest=None, listing=None):
+        return self.find_files(self.view_globs, manifest=manifest,
+                               listing=listing)
@@ -0,0 +1,83 @@
+import json
+import os
+
+import consts
+
+from compat import str_object_hook
+
+
+class Manifest(object):
+    """
+    Persisted listing of the python files found under each discovery root,
+    keyed by the git tree the root pointed to. Checking out another branch
+    and back only changes which listing is used, so the directories are only
+    walked for revisions that haven't been seen before or when files were
+    added or removed without being committed.
+
+    Manifest.trees
+    - which files were under this root when it was this tree?
+    - root:str -> [[tree sha, filenames: [str]]], oldest first
+    """
+
+    VERSION = 2
+
+    def __init__(self, repo=None, path=None, trees=None):
+        self.repo = repo
+        self.path = path
+        self.trees = trees or {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, repo, path):
+        try:
+            with open(path) as f:
+                data = json.load(f, object_hook=str_object_hook)
+        except (IOError, ValueError):
+            return cls(repo=repo, path=path)
+
+        if data.get('version') != cls.VERSION:
+            return cls(repo=repo, path=path)
+
+        return cls(repo=repo, path=path, trees=data['trees'])
+
+    def save(self):
+        if not (self.path and self.dirty):
+            return
+
+        with open(self.path, 'w') as f:
+            json.dump({'version': self.VERSION, 'trees': self.trees}, f)
+
+        self.dirty = False
+
+    def listing(self, root):
+        """All python files at or under root, walking it only if needed."""
+        if os.path.isfile(root):
+            return [root]
+
+        if not self.repo or self.repo.adds_or_removes_files(root):
+            return self.scan(root)
+
+        sha = self.repo.tree_sha(root)
+        revisions = self.trees.setdefault(root, [])
+
+        for revision_sha, filenames in revisions:
+            if revision_sha == sha:
+                return filenames
+
+        filenames = self.scan(root)
+        revisions.append([sha, filenames])
+        del revisions[:-consts.MANIFEST_REVISIONS]
+        self.dirty = True
+
+        return filenames
+
+    @classmethod
+    def scan(cls, root):
+        filenames = []
+
+        for dirpath, _, files in os.walk(root):
+            for f in files:
+                if os.path.splitext(f)[1] == '.py':
+                    filenames.append(os.path.join(dirpath, f))
+
+        return sorted(filenames)
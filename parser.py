@@ -1,7 +1,7 @@
 import ast
-import os
+import re
 
-from collections import defaultdict
+from collections import defaultdict, deque
 
 from termcolor import colored
 from tabulate import tabulate
@@ -9,7 +9,8 @@ from tabulate import tabulate
 import consts
 
 from resolver import Resolver
-from fields import Fields
+from fields import Field, Fields
+from store import FieldStore, SpillingMemo
 
 
 def parse_module(filename):
@@ -22,17 +23,48 @@ def parse_module(filename):
         raise TypeError('Bad file {}'.format(filename))
 
 
-def parse_directory(location):
-    for filename in walk(location):
-        yield parse_module(filename)
+def base_names(node):
+    names = set()
 
+    for base in node.bases:
+        try:
+            names.add(Resolver.resolve(base))
+        except AttributeError:
+            # e.g. a Subscript base that we don't know how to resolve
+            continue
+
+    return names
+
+
+def parse_classes(source):
+    """
+    (filename, source) -> (filename, [(class_node, filename)]). Runs in the
+    parse workers of a Pipeline so it has to stay a top level function.
+    """
+    filename, module = source
+
+    try:
+        tree = ast.parse(module)
+    except TypeError:
+        raise TypeError('Bad file {}'.format(filename))
+
+    candidates = ClassCandidates()
+    ClassVisitor(filename=filename, classes=candidates).visit(tree)
+
+    return filename, list(candidates)
 
-def walk(location):
-    for dirpath, dirs, files in os.walk(location):
-        for f in files:
-            filename, ext = os.path.splitext(f)
-            if ext == '.py':
-                yield os.path.join(dirpath, f)
+
+def reverse_graph(graph):
+    """
+    Turns class_name -> base names into class_name -> subclass names.
+    """
+    subclasses = defaultdict(set)
+
+    for name, bases in graph.items():
+        for base in bases:
+            subclasses[base].add(name)
+
+    return subclasses
 
 
 class ClassVisitor(ast.NodeVisitor):
@@ -50,6 +82,52 @@ class ClassVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 
+class ClassCandidates(list):
+    """
+    Collects (class_node, filename) pairs from a ClassVisitor so they can be
+    filtered before going into a ClassRegistry.
+    """
+
+    def add(self, node, filename):
+        self.append((node, filename))
+
+    def select(self, base_pattern):
+        """
+        Picks out classes that inherit, directly or through other picked
+        classes, from a base matching base_pattern, along with everything
+        those classes inherit from so that their fields can still be resolved.
+        """
+        base_re = re.compile(base_pattern)
+        bases = defaultdict(set)
+
+        for node, _ in self:
+            bases[node.name].update(base_names(node))
+
+        selected = set()
+        changed = True
+        while changed:
+            changed = False
+            for class_name, class_bases in bases.items():
+                if class_name in selected:
+                    continue
+
+                if any(base_re.search(base) or base in selected
+                       for base in class_bases):
+                    selected.add(class_name)
+                    changed = True
+
+        ancestors = list(selected)
+        while ancestors:
+            for base in bases[ancestors.pop()]:
+                if base in bases and base not in selected:
+                    selected.add(base)
+                    ancestors.append(base)
+
+        return [(node, filename)
+                for node, filename in self
+                if node.name in selected]
+
+
 class ClassDiff(object):
     def __init__(self, added=None, removed=None):
         self.added = added or []
@@ -115,6 +193,24 @@ class ClassRegistry(object):
         self.classes[filename].append(node_name)
         self.class_source[node_name].append(filename)
 
+    @classmethod
+    def from_files(cls, filenames, base_pattern):
+        candidates = ClassCandidates()
+
+        for filename in filenames:
+            filename, tree = parse_module(filename)
+            ClassVisitor(filename=filename, classes=candidates).visit(tree)
+
+        return cls.from_candidates(candidates, base_pattern)
+
+    @classmethod
+    def from_candidates(cls, candidates, base_pattern):
+        registry = cls()
+        for node, filename in candidates.select(base_pattern):
+            registry.add(node, filename)
+
+        return registry
+
     def difference(self, other):
         """Diffs two registries with self being the base."""
         self_classes = set(self.nodes.keys())
@@ -135,11 +231,13 @@ class DynamicFieldsVisitor(ast.NodeVisitor):
 
 
 class FieldFinder(object):
-    def __init__(self, serializer_registry, view_registry):
+    def __init__(self, serializer_registry, view_registry, memo_dict=None):
         self.serializer_registry = serializer_registry
         self.view_registry = view_registry
         self._dynamic_field_map = {}
-        self.memo_dict = {}
+        self._view_serializer_map = {}
+        self._own_field_map = {}
+        self.memo_dict = {} if memo_dict is None else memo_dict
 
     @classmethod
     def is_init_method(cls, node):
@@ -175,6 +273,9 @@ class FieldFinder(object):
                         props[lhs] = self.resolve_view_var(rhs)
 
                 serializer_name = props.pop('serializer_class')
+                if serializer_name:
+                    self._view_serializer_map[class_name] = serializer_name
+
                 truncated_props = {
                     key: val
                     for key, val in props.iteritems()
@@ -185,6 +286,48 @@ class FieldFinder(object):
 
         return self._dynamic_field_map
 
+    @property
+    def view_serializers(self):
+        """
+        view_name:str -> name of its serializer_class
+        """
+        if not self._view_serializer_map:
+            # populated as a side effect
+            self.dynamic_fields
+
+        return self._view_serializer_map
+
+    def dependency_graph(self):
+        """
+        serializer_name:str -> names of its bases defined in the registry
+        """
+        nodes = self.serializer_registry.nodes
+
+        return dict(
+            (name, set(base for base in base_names(node)
+                       if base in nodes and base != name))
+            for name, node in nodes.items()
+        )
+
+    def subclass_graph(self):
+        """
+        serializer_name:str -> names of its direct subclasses
+        """
+        return reverse_graph(self.dependency_graph())
+
+    def has_serializer(self, serializer_name):
+        return serializer_name in self.serializer_registry.nodes
+
+    def own_field_names(self, serializer_name):
+        """
+        Names of the fields declared in serializer_name's own class body,
+        which hide any field of the same name from its bases.
+        """
+        if serializer_name not in self._own_field_map:
+            self.find_serializer_fields(serializer_name)
+
+        return self._own_field_map[serializer_name]
+
     def resolve_view_var(self, node):
         try:
             return Resolver.resolve(node)
@@ -192,9 +335,13 @@ class FieldFinder(object):
             raise
 
     def augment_field(self, previous, current):
-        previous.update_representations(current.representations)
+        # previous may be shared with a base's memoized Fields, which must
+        # not pick up this class's representations
+        augmented = Field(previous)
+        augmented.update_representations(previous.representations)
+        augmented.update_representations(current.representations)
 
-        return previous
+        return augmented
 
     def find_serializer_fields(self, serializer_name):
         nodes = self.serializer_registry.nodes
@@ -216,6 +363,8 @@ class FieldFinder(object):
             elif self.is_init_method(node):
                 init_node = node
 
+        self._own_field_map[serializer_name] = set(fields)
+
         # add fields from bases, in left to right order. The bases of the base
         # trumps the neighbour of the base if there's overlap.
         for base in class_node.bases:
@@ -258,24 +407,85 @@ class FieldFinder(object):
     def difference(self, other):
         return self.serializer_registry.difference(other.serializer_registry)
 
+    def close(self):
+        pass
+
     @classmethod
-    def crawl(cls, serializer_directory, view_directory, files=None):
-        files = files or []
+    def discover(cls, layout, manifest=None, pipeline=None, **kwargs):
+        if pipeline:
+            serializer_registry, view_registry = pipeline.registries(layout)
+            return cls(serializer_registry, view_registry, **kwargs)
 
-        serializer_registry = ClassRegistry()
-        view_registry = ClassRegistry()
+        serializer_registry = ClassRegistry.from_files(
+            layout.serializer_files(manifest=manifest),
+            layout.serializer_base_pattern
+        )
+        view_registry = ClassRegistry.from_files(
+            layout.view_files(manifest=manifest),
+            layout.view_base_pattern
+        )
 
-        for filename, tree in parse_directory(serializer_directory):
-            ClassVisitor(filename=filename, classes=serializer_registry).visit(tree)
+        return cls(serializer_registry, view_registry, **kwargs)
 
-        for filename, tree in parse_directory(view_directory):
-            ClassVisitor(filename=filename, classes=view_registry).visit(tree)
 
-        for filename in files:
-            filename, tree = parse_module(filename)
-            ClassVisitor(filename=filename, classes=serializer_registry).visit(tree)
+class BoundedFieldFinder(FieldFinder):
+    """
+    FieldFinder that resolves serializers base-first in one pass, spilling
+    resolved Fields to a FieldStore and keeping only max_bytes of them in
+    memory. Class bodies are dropped once resolved since their Fields can
+    always be read back from the store.
+    """
+
+    def __init__(self, serializer_registry, view_registry, store=None,
+                 max_bytes=consts.MAX_MEMORY_MB * 1024 * 1024):
+        self.store = store or FieldStore()
+        super(BoundedFieldFinder, self).__init__(
+            serializer_registry, view_registry,
+            memo_dict=SpillingMemo(self.store, max_bytes)
+        )
+
+    def topological_order(self, graph):
+        dependents = defaultdict(list)
+
+        for name, bases in graph.items():
+            for base in bases:
+                dependents[base].append(name)
+
+        remaining = dict((name, len(bases)) for name, bases in graph.items())
+        ready = deque(sorted(name for name, count in remaining.items()
+                             if not count))
+
+        while ready:
+            name = ready.popleft()
+            del remaining[name]
+            yield name
+
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if not remaining[dependent]:
+                    ready.append(dependent)
+
+        # Whatever is left is in an inheritance cycle, which can only happen
+        # with re-defined class names. Resolve those in any order.
+        for name in sorted(remaining):
+            yield name
+
+    def resolve_all(self):
+        graph = self.dependency_graph()
+        nodes = self.serializer_registry.nodes
+
+        for name, subclasses in reverse_graph(graph).items():
+            self.memo_dict.expect(name, len(subclasses))
+
+        for name in self.topological_order(graph):
+            self.find_serializer_fields(name)
+            del nodes[name].body[:]
+
+            for base in graph[name]:
+                self.memo_dict.release(base)
 
-        return cls(serializer_registry, view_registry)
+    def close(self):
+        self.store.close()
 
 
 def fmt_serializer(node, fields):
@@ -0,0 +1,130 @@
+import multiprocessing
+import threading
+
+from collections import deque
+from Queue import Empty, Queue
+
+import consts
+
+from parser import ClassCandidates, ClassRegistry, parse_classes
+
+
+def read_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+class Pipeline(object):
+    """
+    Reads and parses the files of one revision with the stages running
+    concurrently: a thread reads sources (from disk or git) into a bounded
+    queue, a process pool parses them, and the caller registers classes as
+    parsed files come back. At most queue_size sources wait to be parsed and
+    at most queue_size are handed to the pool, so a slow consumer stalls the
+    reader instead of letting sources pile up. Handing sources to the pool
+    happens in the caller, so when a file fails to parse nothing is left
+    blocked inside the pool and it can be torn down right away.
+
+    Without jobs every file is read and parsed in turn in this process,
+    which is how a revision is read out of git when --jobs isn't given.
+    """
+
+    def __init__(self, listing, reader, jobs=None,
+                 queue_size=consts.QUEUE_SIZE):
+        self.listing = listing
+        self.reader = reader
+        self.jobs = jobs
+        self.queue_size = queue_size
+        self.error = None
+
+    @classmethod
+    def for_worktree(cls, manifest, **kwargs):
+        return cls(manifest.listing, read_file, **kwargs)
+
+    @classmethod
+    def for_revision(cls, repo, ref, **kwargs):
+        return cls(
+            lambda path: repo.list_files(ref, path),
+            lambda filename: repo.read_file(ref, filename),
+            **kwargs
+        )
+
+    def read(self, filenames, queue, stop):
+        try:
+            for filename in filenames:
+                if stop.is_set():
+                    break
+                queue.put((filename, self.reader(filename)))
+        except Exception as e:
+            self.error = e
+        finally:
+            queue.put(None)
+
+    def stop_reading(self, reader, queue, stop):
+        stop.set()
+
+        # the reader may be waiting for room in the queue
+        while reader.is_alive():
+            try:
+                queue.get_nowait()
+            except Empty:
+                reader.join(0.1)
+
+    def parse(self, filenames):
+        """Yields (filename, [(class_node, filename)]) in filenames order."""
+        if not self.jobs:
+            for filename in filenames:
+                yield parse_classes((filename, self.reader(filename)))
+            return
+
+        # fork the workers before the reader thread exists, so that none of
+        # them inherits a lock the reader happened to be holding
+        pool = multiprocessing.Pool(self.jobs)
+
+        queue = Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        reader = threading.Thread(target=self.read,
+                                  args=(filenames, queue, stop))
+        reader.daemon = True
+        reader.start()
+
+        in_flight = deque()
+
+        try:
+            for source in iter(queue.get, None):
+                in_flight.append(pool.apply_async(parse_classes, (source,)))
+
+                if len(in_flight) == self.queue_size:
+                    yield in_flight.popleft().get()
+
+            while in_flight:
+                yield in_flight.popleft().get()
+        finally:
+            self.stop_reading(reader, queue, stop)
+            pool.terminate()
+
+        if self.error:
+            raise self.error
+
+    def registries(self, layout):
+        serializer_files = layout.serializer_files(listing=self.listing)
+        view_files = layout.view_files(listing=self.listing)
+        serializer_set = set(serializer_files)
+        view_set = set(view_files)
+
+        serializers = ClassCandidates()
+        views = ClassCandidates()
+        filenames = serializer_files + [f for f in view_files
+                                        if f not in serializer_set]
+
+        for filename, candidates in self.parse(filenames):
+            if filename in serializer_set:
+                serializers.extend(candidates)
+            if filename in view_set:
+                views.extend(candidates)
+
+        return (
+            ClassRegistry.from_candidates(serializers,
+                                          layout.serializer_base_pattern),
+            ClassRegistry.from_candidates(views, layout.view_base_pattern),
+        )
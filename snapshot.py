@@ -0,0 +1,176 @@
+import hashlib
+import json
+import zlib
+
+from compat import str_object_hook
+from fields import Field, Fields
+from parser import ClassDiff, reverse_graph
+
+
+MAGIC = 'DOCDIFFER-SNAPSHOT'
+
+
+def dump_fields(fields):
+    return dict(
+        (field_name, {
+            'params': dict(field),
+            'representations': dict(
+                (condition, dict(representation))
+                for condition, representation
+                in field.representations.items()
+            )
+        })
+        for field_name, field in fields.items()
+    )
+
+
+def load_fields(data):
+    fields = Fields()
+
+    for field_name, field_data in data.items():
+        field = Field(field_data['params'])
+        field.update_representations(dict(
+            (condition, Field(representation))
+            for condition, representation
+            in field_data['representations'].items()
+        ))
+        fields[field_name] = field
+
+    return fields
+
+
+class Snapshot(object):
+    """
+    Fully resolved API surface read back from a snapshot file. Quacks like a
+    FieldFinder as far as reporting is concerned.
+
+    The file is a magic line, a JSON header line and then one zlib compressed
+    JSON record of Fields per serializer. Records are only read and decoded
+    when a serializer's fields are asked for.
+
+    Snapshot.index
+    - where is this serializer's record and what is its digest?
+    - serializer_name:str -> [offset: int, length: int, digest: str]
+
+    Snapshot.bases
+    - serializer_name:str -> names of its bases in the snapshot
+
+    Snapshot.own_fields
+    - serializer_name:str -> names of the fields its own class body declares
+    """
+
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+
+        if self.file.readline().split() != [MAGIC, str(self.VERSION)]:
+            self.file.close()
+            raise ValueError('{} is not a version {} snapshot'.format(
+                path, self.VERSION
+            ))
+
+        header = json.loads(self.file.readline(),
+                            object_hook=str_object_hook)
+        self.body_offset = self.file.tell()
+        self.index = header['index']
+        self.bases = header['bases']
+        self.own_fields = header['own_fields']
+        self.view_serializers = header['view_serializers']
+        self.dynamic_fields = header['dynamic_fields']
+        self.memo_dict = {}
+
+    @classmethod
+    def write(cls, ff, path):
+        index = {}
+        records = []
+        offset = 0
+
+        for serializer_name in sorted(ff.serializer_registry.nodes):
+            fields = ff.find_serializer_fields(serializer_name)
+            data = json.dumps(dump_fields(fields), sort_keys=True,
+                              separators=(',', ':'))
+            record = zlib.compress(data)
+
+            index[serializer_name] = [
+                offset, len(record), hashlib.sha1(data).hexdigest()
+            ]
+            records.append(record)
+            offset += len(record)
+
+        header = {
+            'index': index,
+            'bases': dict(
+                (name, sorted(bases))
+                for name, bases in ff.dependency_graph().items()
+            ),
+            'own_fields': dict(
+                (name, sorted(ff.own_field_names(name)))
+                for name in index
+            ),
+            'view_serializers': ff.view_serializers,
+            # views without a serializer_class end up under None
+            'dynamic_fields': dict(
+                (name, props)
+                for name, props in ff.dynamic_fields.items()
+                if name is not None
+            ),
+        }
+
+        with open(path, 'wb') as f:
+            f.write('{} {}\n'.format(MAGIC, cls.VERSION))
+            f.write(json.dumps(header, separators=(',', ':')) + '\n')
+            for record in records:
+                f.write(record)
+
+    def has_serializer(self, serializer_name):
+        return serializer_name in self.index
+
+    def own_field_names(self, serializer_name):
+        return set(self.own_fields[serializer_name])
+
+    def find_serializer_fields(self, serializer_name):
+        if serializer_name in self.memo_dict:
+            return self.memo_dict[serializer_name]
+
+        offset, length, _ = self.index[serializer_name]
+        self.file.seek(self.body_offset + offset)
+        data = json.loads(zlib.decompress(self.file.read(length)),
+                          object_hook=str_object_hook)
+
+        fields = load_fields(data)
+        self.memo_dict[serializer_name] = fields
+
+        return fields
+
+    def dependency_graph(self):
+        return self.bases
+
+    def subclass_graph(self):
+        return reverse_graph(self.bases)
+
+    def difference(self, other):
+        """Diffs two snapshots with self being the base."""
+        self_serializers = set(self.index)
+        other_serializers = set(other.index)
+
+        added = sorted(self_serializers.difference(other_serializers))
+        removed = sorted(other_serializers.difference(self_serializers))
+
+        return ClassDiff(added=added, removed=removed)
+
+    def changed_serializers(self, other):
+        """
+        Serializers in both snapshots whose fields differ, found by comparing
+        digests without decoding anything.
+        """
+        return sorted(
+            serializer_name
+            for serializer_name, (_, _, digest) in self.index.items()
+            if serializer_name in other.index and
+            other.index[serializer_name][2] != digest
+        )
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+
+from collections import OrderedDict
+
+try:
+    import anydbm as dbm
+    import cPickle as pickle
+except ImportError:
+    import dbm
+    import pickle
+
+
+class FieldStore(object):
+    """
+    On-disk store of resolved Fields, keyed by serializer name. Values are
+    kept pickled so that their size is known when they are read back.
+    """
+
+    def __init__(self, directory=None):
+        self.owns_directory = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix='docdiffer-')
+        self.db = dbm.open(os.path.join(self.directory, 'fields'), 'n')
+
+    def __contains__(self, name):
+        return name in self.db
+
+    def get(self, name):
+        return self.db[name]
+
+    def put(self, name, data):
+        self.db[name] = data
+
+    def close(self):
+        self.db.close()
+
+        if self.owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SpillingMemo(object):
+    """
+    Stand-in for FieldFinder.memo_dict that writes every resolved Fields to a
+    FieldStore and keeps at most max_bytes (measured as pickled size) of them
+    in memory.
+
+    SpillingMemo.cache
+    - which Fields are in memory, least recently used first?
+    - serializer_name:str -> (fields: Fields, size: int)
+
+    SpillingMemo.pending
+    - how many subclasses still need this serializer's Fields to resolve?
+    - serializer_name:str -> count: int
+    """
+
+    def __init__(self, store, max_bytes):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.size = 0
+
+    def __contains__(self, name):
+        return name in self.cache or name in self.store
+
+    def __getitem__(self, name):
+        if name in self.cache:
+            entry = self.cache.pop(name)
+            self.cache[name] = entry
+            return entry[0]
+
+        data = self.store.get(name)
+        fields = pickle.loads(data)
+        self.cache_fields(name, fields, len(data))
+
+        return fields
+
+    def __setitem__(self, name, fields):
+        data = pickle.dumps(fields, pickle.HIGHEST_PROTOCOL)
+        self.store.put(name, data)
+        self.cache_fields(name, fields, len(data))
+
+    def cache_fields(self, name, fields, size):
+        if name in self.cache:
+            self.size -= self.cache.pop(name)[1]
+
+        self.cache[name] = (fields, size)
+        self.size += size
+        self.evict()
+
+    def expect(self, name, dependents):
+        self.pending[name] = dependents
+
+    def release(self, name):
+        """One more subclass of name has been resolved."""
+        self.pending[name] = self.pending.get(name, 1) - 1
+
+    def evict(self):
+        """
+        Drops least recently used Fields until under max_bytes, preferring
+        those that no unresolved subclass still depends on. Everything is in
+        the store already so nothing is lost.
+        """
+        while self.size > self.max_bytes and len(self.cache) > 1:
+            victim = next(
+                (name for name in self.cache if self.pending.get(name, 0) <= 0),
+                next(iter(self.cache))
+            )
+            self.size -= self.cache.pop(victim)[1]